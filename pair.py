@@ -1,7 +1,17 @@
-from math import log, floor
+from bisect import bisect_left, bisect_right
+from math import log, log10, floor, sqrt
 from position import Position
+import swap_math
+import sys
 from tick import Tick
-from typing import Tuple
+from typing import List, Tuple
+
+
+# sqrt(10**e) for every price exponent a tick can have
+_SQRT_POW10 = {e: 10 ** (e / 2) for e in range(-60, 60)}
+# Price levels above and below price one, as searched by `sqrt_price_to_tick`
+_POS_PRICE_LEVELS = tuple(10**i for i in range(50))
+_NEG_PRICE_LEVELS = tuple(10**-i for i in range(50))
 
 
 class Pair:
@@ -64,12 +74,22 @@ class Pair:
         self.fee_tier = fee_tier
         self.std_increment_distance = int(9e6)  # Refer Osmosis docs
         self.exp_at_price_one = -6
+        # Mantissas of the price at the start of an increment level above and
+        # below price one, folded once per pool for `tick_to_sqrt_price`
+        self._mantissa_above_one = 10 ** -self.exp_at_price_one
+        self._mantissa_below_one = 10 ** (1 - self.exp_at_price_one)
+        self._tick_sqrt_price_cache = {}  # Memoized `tick_to_sqrt_price`
         self.tick_spacing = tick_spacing
         self.curr_sqrt_price = init_sqrt_price
         self.curr_tick_idx = self.sqrt_price_to_tick(self.curr_sqrt_price)
         self.positions = {}
         self.ticks = {}
-        self.all_ticks = {}  # Keep track of all ticks ever initialized
+        self._tick_keys = []  # Sorted indexes of the ticks in `self.ticks`
+        self._sorted_ticks = []  # The ticks themselves, in the same order
+        self._tick_sqrt_prices = []  # Their sqrt prices, in the same order
+        # `fee_within_range` results by (lower tick, upper tick), valid until
+        # the next swap changes the price or fee growth
+        self._fee_within_range_cache = {}
         # Track global fees per liquidity (as explained in WP)
         self.fee_growth_global_x = 0
         self.fee_growth_global_y = 0
@@ -103,76 +123,71 @@ class Pair:
         Position
             The position where the liquidity was added.
         """
+        # Interned owners share one string object, so position keys hash and
+        # compare by identity on later lookups
+        owner = sys.intern(owner)
         # Update global liquidity
         if (self.curr_tick_idx >= lower_tick_idx
                 and self.curr_tick_idx < upper_tick_idx):
             self.liquidity += liquidity
+        # Create or update ticks, looking each one up only once
+        lower_tick = self.ticks.get(lower_tick_idx)
+        if lower_tick is None:
+            (lower_tick_fee_growth_outside_x,
+             lower_tick_fee_growth_outside_y) =\
+                self.fee_growth_outside(lower_tick_idx)
+            lower_tick = Tick(
+                lower_tick_idx,
+                liquidity_net=liquidity,
+                liquidity_gross=liquidity,
+                fee_growth_outside_x=lower_tick_fee_growth_outside_x,
+                fee_growth_outside_y=lower_tick_fee_growth_outside_y
+            )
+            self._insert_tick(lower_tick)
+        else:
+            lower_tick.liquidity_net += liquidity
+            lower_tick.liquidity_gross += liquidity
+
+        upper_tick = self.ticks.get(upper_tick_idx)
+        if upper_tick is None:
+            (upper_tick_fee_growth_outside_x,
+             upper_tick_fee_growth_outside_y) =\
+                self.fee_growth_outside(upper_tick_idx)
+            upper_tick = Tick(
+                upper_tick_idx,
+                liquidity_net=-liquidity,
+                liquidity_gross=liquidity,
+                fee_growth_outside_x=upper_tick_fee_growth_outside_x,
+                fee_growth_outside_y=upper_tick_fee_growth_outside_y
+            )
+            self._insert_tick(upper_tick)
+        else:
+            upper_tick.liquidity_net -= liquidity
+            upper_tick.liquidity_gross += liquidity
+
         # Create or update position
         key = (owner, lower_tick_idx, upper_tick_idx)
-        if (key in self.positions
-                and lower_tick_idx in self.ticks
-                and upper_tick_idx in self.ticks):
-            self.collect_fees(self.positions[key])
-            self.positions[key].liquidity += liquidity
-            position = self.positions[key]
-
-            self.ticks[lower_tick_idx].liquidity_net += liquidity
-            self.ticks[lower_tick_idx].liquidity_gross += liquidity
-            self.ticks[upper_tick_idx].liquidity_net -= liquidity
-            self.ticks[upper_tick_idx].liquidity_gross += liquidity
-
+        position = self.positions.get(key)
+        if position is not None:
+            # A position keeps its ticks, and so their fee growth, after they
+            # are deleted. Rebind it in case they have been re-initialized.
+            position.lower_tick = lower_tick
+            position.upper_tick = upper_tick
+            self.collect_fees(position)
+            position.liquidity += liquidity
         else:
-            if lower_tick_idx not in self.ticks:
-                (lower_tick_fee_growth_outside_x,
-                 lower_tick_fee_growth_outside_y) =\
-                    self.fee_growth_outside(lower_tick_idx)
-                self.ticks[lower_tick_idx] = Tick(
-                    lower_tick_idx,
-                    liquidity_net=liquidity,
-                    liquidity_gross=liquidity,
-                    fee_growth_outside_x=lower_tick_fee_growth_outside_x,
-                    fee_growth_outside_y=lower_tick_fee_growth_outside_y
-                )
-                self.all_ticks[lower_tick_idx] = self.ticks[lower_tick_idx]
-            else:
-                self.ticks[lower_tick_idx].liquidity_net += liquidity
-                self.ticks[lower_tick_idx].liquidity_gross += liquidity
-
-            if upper_tick_idx not in self.ticks:
-                (upper_tick_fee_growth_outside_x,
-                 upper_tick_fee_growth_outside_y) =\
-                    self.fee_growth_outside(upper_tick_idx)
-                self.ticks[upper_tick_idx] = Tick(
-                    upper_tick_idx,
-                    liquidity_net=-liquidity,
-                    liquidity_gross=liquidity,
-                    fee_growth_outside_x=upper_tick_fee_growth_outside_x,
-                    fee_growth_outside_y=upper_tick_fee_growth_outside_y
-                )
-                self.all_ticks[upper_tick_idx] = self.ticks[upper_tick_idx]
-            else:
-                self.ticks[upper_tick_idx].liquidity_net -= liquidity
-                self.ticks[upper_tick_idx].liquidity_gross += liquidity
-
-            if key in self.positions:
-                self.collect_fees(self.positions[key])
-                self.positions[key].liquidity += liquidity
-                position = self.positions[key]
-            else:
-                # Get fee within range
-                fee_within_range_x, fee_within_range_y = self.fee_within_range(
-                    self.ticks[lower_tick_idx], self.ticks[upper_tick_idx]
-                )
-                position = Position(
-                    owner,
-                    liquidity,
-                    self.ticks[lower_tick_idx],
-                    self.ticks[upper_tick_idx],
-                    fee_within_range_x, fee_within_range_y
-                )
+            # Get fee within range
+            fee_within_range_x, fee_within_range_y =\
+                self.fee_within_range(lower_tick, upper_tick)
+            position = Position(
+                owner,
+                liquidity,
+                lower_tick,
+                upper_tick,
+                fee_within_range_x, fee_within_range_y
+            )
             self.positions[key] = position
 
-        self.sort_tick_map()
         delta_x, delta_y =\
             self.liquidity_to_tokens(liquidity, lower_tick_idx, upper_tick_idx)
         self.token_x_balance += delta_x
@@ -208,25 +223,21 @@ class Pair:
             self.collect_fees(position)
             position.liquidity -= liquidity
 
-        self.ticks[position.lower_tick.idx].liquidity_net -= liquidity
-        self.ticks[position.lower_tick.idx].liquidity_gross -= liquidity
-        self.update_tick_map(position.lower_tick.idx)
+        lower_tick = self.ticks[position.lower_tick.idx]
+        lower_tick.liquidity_net -= liquidity
+        lower_tick.liquidity_gross -= liquidity
+        self.update_tick_map(lower_tick.idx)
 
-        self.ticks[position.upper_tick.idx].liquidity_net += liquidity
-        self.ticks[position.upper_tick.idx].liquidity_gross -= liquidity
-        self.update_tick_map(position.upper_tick.idx)
+        upper_tick = self.ticks[position.upper_tick.idx]
+        upper_tick.liquidity_net += liquidity
+        upper_tick.liquidity_gross -= liquidity
+        self.update_tick_map(upper_tick.idx)
         delta_x, delta_y =\
             self.liquidity_to_tokens(liquidity, position.lower_tick.idx,
                                      position.upper_tick.idx)
         self.token_x_balance -= delta_x
         self.token_y_balance -= delta_y
 
-    def sort_tick_map(self) -> None:
-        """
-        Sorts the tick map by tick index.
-        """
-        self.ticks = dict(sorted(self.ticks.items()))
-
     def liquidity_to_tokens(
             self,
             liquidity: str,
@@ -265,6 +276,22 @@ class Pair:
         delta_y = liquidity * (p_c - p_a)
         return max(delta_x, 0), max(delta_y, 0)
 
+    def _insert_tick(self, tick: Tick) -> None:
+        """
+        Adds a newly initialized tick to the tick map and the sorted index.
+
+        Parameters
+        ----------
+        tick : Tick
+            The tick to be added.
+        """
+        sqrt_price, _ = self.tick_to_sqrt_price(tick.idx)
+        row = bisect_left(self._tick_keys, tick.idx)
+        self._tick_keys.insert(row, tick.idx)
+        self._sorted_ticks.insert(row, tick)
+        self._tick_sqrt_prices.insert(row, sqrt_price)
+        self.ticks[tick.idx] = tick
+
     def update_tick_map(self, tick_idx: int) -> None:
         """
         Updates the tick map after a liquidity removal.
@@ -276,7 +303,10 @@ class Pair:
         """
         if self.ticks[tick_idx].liquidity_gross == 0:
             del self.ticks[tick_idx]
-        self.sort_tick_map()
+            row = bisect_left(self._tick_keys, tick_idx)
+            del self._tick_keys[row]
+            del self._sorted_ticks[row]
+            del self._tick_sqrt_prices[row]
 
     def find_next_tick(self, tick_idx: int, higher: bool) -> int:
         """
@@ -292,32 +322,15 @@ class Pair:
         Returns
         -------
         int
-            The next tick index.
-        """
-        keys = list(self.ticks.keys())
-        found = 0
-        for key in keys:
-            if key < tick_idx and not higher:
-                next_tick = key
-                found = 1
-            elif key == tick_idx:
-                position = keys.index(tick_idx)
-                if higher:
-                    next_tick = keys[position + 1]
-                    found = 1
-                    break
-                if not higher:
-                    next_tick = keys[position - 1]
-                    found = 1
-                    break
-            elif key > tick_idx and higher:
-                next_tick = key
-                found = 1
-                break
-
-        if found == 0:
-            next_tick = None
-        return next_tick
+            The next tick index, or None if there is no such tick.
+        """
+        if higher:
+            i = bisect_right(self._tick_keys, tick_idx)
+        else:
+            i = bisect_left(self._tick_keys, tick_idx) - 1
+        if 0 <= i < len(self._tick_keys):
+            return self._tick_keys[i]
+        return None
 
     def fee_growth_outside(self, tick_idx) -> Tuple[int, int]:
         """
@@ -328,17 +341,17 @@ class Pair:
         Tuple[int, int]
             The fee growth outside the tick, in token x and token y.
         """
-        if tick_idx not in self.ticks:
+        # A single lookup serves both the membership test and the read
+        tick = self.ticks.get(tick_idx)
+        if tick is None:
             if self.curr_tick_idx >= tick_idx:
                 return (self.fee_growth_global_x, self.fee_growth_global_y)
             else:
                 return (0, 0)
         else:
             return (
-                self.fee_growth_global_x
-                - self.ticks[tick_idx].fee_growth_outside_x,
-                self.fee_growth_global_y
-                - self.ticks[tick_idx].fee_growth_outside_y
+                self.fee_growth_global_x - tick.fee_growth_outside_x,
+                self.fee_growth_global_y - tick.fee_growth_outside_y
             )
 
     def fee_within_range(
@@ -361,34 +374,43 @@ class Pair:
         Tuple[int, int]
             The fee within the range, in token x and token y.
         """
-        if self.curr_tick_idx >= lower_tick.idx:
-            fee_below_lower = (
-                lower_tick.fee_growth_outside_x,
-                lower_tick.fee_growth_outside_y
-            )
+        # Ticks hash by identity, so a re-initialized tick never hits the
+        # entry of the tick object it replaced
+        key = (lower_tick, upper_tick)
+        cached = self._fee_within_range_cache.get(key)
+        if cached is not None:
+            return cached
+        # Scalar locals instead of intermediate tuples; the subtraction order
+        # matches the per-token formula in the whitepaper
+        curr_tick_idx = self.curr_tick_idx
+        fee_growth_global_x = self.fee_growth_global_x
+        fee_growth_global_y = self.fee_growth_global_y
+        if curr_tick_idx >= lower_tick.idx:
+            fee_below_lower_x = lower_tick.fee_growth_outside_x
+            fee_below_lower_y = lower_tick.fee_growth_outside_y
         else:
-            fee_below_lower = (
-                self.fee_growth_global_x - lower_tick.fee_growth_outside_x,
-                self.fee_growth_global_y - lower_tick.fee_growth_outside_y
-            )
-
-        if self.curr_tick_idx >= upper_tick.idx:
-            fee_above_upper = (
-                self.fee_growth_global_x - upper_tick.fee_growth_outside_x,
-                self.fee_growth_global_y - upper_tick.fee_growth_outside_y
-            )
+            fee_below_lower_x =\
+                fee_growth_global_x - lower_tick.fee_growth_outside_x
+            fee_below_lower_y =\
+                fee_growth_global_y - lower_tick.fee_growth_outside_y
+
+        if curr_tick_idx >= upper_tick.idx:
+            fee_above_upper_x =\
+                fee_growth_global_x - upper_tick.fee_growth_outside_x
+            fee_above_upper_y =\
+                fee_growth_global_y - upper_tick.fee_growth_outside_y
         else:
-            fee_above_upper = (
-                upper_tick.fee_growth_outside_x,
-                upper_tick.fee_growth_outside_y
-            )
+            fee_above_upper_x = upper_tick.fee_growth_outside_x
+            fee_above_upper_y = upper_tick.fee_growth_outside_y
 
         fee_within_range_x =\
-            self.fee_growth_global_x - fee_above_upper[0] - fee_below_lower[0]
+            fee_growth_global_x - fee_above_upper_x - fee_below_lower_x
         fee_within_range_y =\
-            self.fee_growth_global_y - fee_above_upper[1] - fee_below_lower[1]
+            fee_growth_global_y - fee_above_upper_y - fee_below_lower_y
 
-        return fee_within_range_x, fee_within_range_y
+        result = (fee_within_range_x, fee_within_range_y)
+        self._fee_within_range_cache[key] = result
+        return result
 
     def get_fees(self, position: Position) -> Tuple[int, int]:
         """
@@ -404,10 +426,20 @@ class Pair:
         Tuple[int, int]
             The fees held, in token x and token y, by the given position.
         """
+        fees_x, fees_y, _, _ = self._fees_and_range(position)
+        return fees_x, fees_y
+
+    def _fees_and_range(
+            self,
+            position: Position
+    ) -> Tuple[float, float, float, float]:
+        """
+        Returns the fees held by a position together with the fee within its
+        range, from a single `fee_within_range` evaluation.
+        """
         # Get fees accumulated within range
         fee_within_range_x, fee_within_range_y = self.fee_within_range(
-            self.all_ticks[position.lower_tick.idx],
-            self.all_ticks[position.upper_tick.idx]
+            position.lower_tick, position.upper_tick
         )
         # Sub fees this position has already collected or isn't entitled to
         fees_x = fee_within_range_x - position.fee_growth_inside_x
@@ -415,7 +447,7 @@ class Pair:
         fees_y = fee_within_range_y - position.fee_growth_inside_y
         fees_y = fees_y * position.liquidity
 
-        return fees_x, fees_y
+        return fees_x, fees_y, fee_within_range_x, fee_within_range_y
 
     def collect_fees(self, position: Position) -> Tuple[float, float]:
         """
@@ -432,14 +464,10 @@ class Pair:
             The fees collected, in token x and token y.
         """
         # Get fees accumulated within range
-        fees_x, fees_y = self.get_fees(position)
+        fees_x, fees_y, fee_within_range_x, fee_within_range_y =\
+            self._fees_and_range(position)
 
         # Update fee growth in position object
-        fee_within_range_x, fee_within_range_y = self.fee_within_range(
-            self.all_ticks[position.lower_tick.idx],
-            self.all_ticks[position.upper_tick.idx]
-        )
-
         position.fee_growth_inside_x = fee_within_range_x
         position.fee_growth_inside_y = fee_within_range_y
 
@@ -448,6 +476,27 @@ class Pair:
 
         return fees_x, fees_y
 
+    def collect_all_fees(self) -> Tuple[float, float]:
+        """
+        Collects fees from every position in the pair.
+
+        Positions sharing a range reuse the cached `fee_within_range` result
+        for it.
+
+        Returns
+        -------
+        Tuple[float, float]
+            The total fees collected, in token x and token y.
+        """
+        total_fees_x = 0
+        total_fees_y = 0
+        for position in self.positions.values():
+            fees_x, fees_y = self.collect_fees(position)
+            total_fees_x += fees_x
+            total_fees_y += fees_y
+
+        return total_fees_x, total_fees_y
+
     def withdraw_fees(self, position: Position) -> Tuple[float, float]:
         """
         Withdraws fees from a position.
@@ -492,45 +541,48 @@ class Pair:
         int
             The corresponding tick, as per the pool's tick spacing.
         """
-        tick_step = int(precise_tick/self.tick_spacing)
-        if precise_tick >= 0:
-            tick = tick_step * self.tick_spacing
-        else:
-            if tick_step % 1 != 0:
-                tick = (tick_step - 1) * self.tick_spacing
-            else:
-                tick = tick_step * self.tick_spacing
-        return tick
+        # floor rounds towards -inf, so negative ticks round down as well
+        return floor(precise_tick/self.tick_spacing) * self.tick_spacing
 
     def tick_to_sqrt_price(self, tick: int) -> Tuple[float, float]:
-        curr_increment_lvl = int(abs(tick/self.std_increment_distance))
+        # Depends only on the tick index, so results are cached per tick
+        cached = self._tick_sqrt_price_cache.get(tick)
+        if cached is not None:
+            return cached
+        std_increment_distance = self.std_increment_distance
+        exp_at_price_one = self.exp_at_price_one
+        curr_increment_lvl = int(abs(tick/std_increment_distance))
+        # price = 10**exp_at_curr_tick * mantissa, so its square root is a
+        # table lookup times sqrt(mantissa)
         if tick > 0:
-            exp_at_curr_tick = self.exp_at_price_one + curr_increment_lvl
-            curr_additive_increment = 10 ** (exp_at_curr_tick)
+            exp_at_curr_tick = exp_at_price_one + curr_increment_lvl
             num_additive_ticks =\
-                tick - (curr_increment_lvl * self.std_increment_distance)
-            price = ((10 ** curr_increment_lvl)
-                     + (num_additive_ticks * curr_additive_increment))
+                tick - (curr_increment_lvl * std_increment_distance)
+            mantissa = self._mantissa_above_one + num_additive_ticks
         else:
-            exp_at_curr_tick = self.exp_at_price_one - (curr_increment_lvl + 1)
-            curr_additive_increment = 10 ** (exp_at_curr_tick)
+            exp_at_curr_tick = exp_at_price_one - (curr_increment_lvl + 1)
             num_additive_ticks =\
-                -tick - (curr_increment_lvl * self.std_increment_distance)
-            price = ((10 ** -curr_increment_lvl)
-                     - (num_additive_ticks * curr_additive_increment))
-        return price**(1/2), (price + curr_additive_increment)**(1/2)
+                -tick - (curr_increment_lvl * std_increment_distance)
+            mantissa = self._mantissa_below_one - num_additive_ticks
+        sqrt_increment = _SQRT_POW10[exp_at_curr_tick]
+        sqrt_prices = (sqrt_increment * sqrt(mantissa),
+                       sqrt_increment * sqrt(mantissa + 1))
+        self._tick_sqrt_price_cache[tick] = sqrt_prices
+        return sqrt_prices
 
     def sqrt_price_to_tick(self, sqrt_price: float) -> Tuple[int, int]:
         price = sqrt_price**2
         if price == 1:
             tick = 0
         elif price > 1:
-            price_levels = [10**i for i in range(int(50))]  # Adjust range as needed
-            for i, pl in enumerate(price_levels):
-                if price > pl and price <= price_levels[i+1]:
-                    price_level = pl
-                    price_level_index = i
-                    break
+            # Level i holds prices in (10**i, 10**(i+1)]; log10 gives it
+            # directly, up to rounding at the level boundaries
+            price_level_index = min(int(log10(price)), 48)
+            if price <= _POS_PRICE_LEVELS[price_level_index]:
+                price_level_index -= 1
+            elif price > _POS_PRICE_LEVELS[price_level_index + 1]:
+                price_level_index += 1
+            price_level = _POS_PRICE_LEVELS[price_level_index]
             exp_at_curr_tick = int(price_level_index - 6)
             curr_additive_increment = 10 ** (exp_at_curr_tick)
             tick_level = price_level_index * self.std_increment_distance
@@ -538,12 +590,13 @@ class Pair:
                                    / curr_additive_increment)
             tick = tick_level + additive_ticks
         else:
-            price_levels = [10**-i for i in range(int(50))]  # Adjust range as needed
-            for i, pl in enumerate(price_levels):
-                if price < pl and price >= price_levels[i+1]:
-                    price_level = pl
-                    price_level_index = i
-                    break
+            # Level i holds prices in [10**-(i+1), 10**-i)
+            price_level_index = min(int(-log10(price)), 48)
+            if price >= _NEG_PRICE_LEVELS[price_level_index]:
+                price_level_index -= 1
+            elif price < _NEG_PRICE_LEVELS[price_level_index + 1]:
+                price_level_index += 1
+            price_level = _NEG_PRICE_LEVELS[price_level_index]
             exp_at_curr_tick = -1 * int(price_level_index + 7)
             curr_additive_increment = 10 ** (exp_at_curr_tick)
             tick_level = -price_level_index * self.std_increment_distance
@@ -592,17 +645,41 @@ class Pair:
         fees = amount_used - amount_used_for_swap
         return amount_used, fees
 
-    def revert_swap(self, original_state: dict):
+    def revert_swap(
+            self,
+            snapshot: tuple,
+            patched_ticks: List[Tuple[Tick, float, float]]
+    ) -> None:
         """
-        Reverts a swap by restoring all class attributes to their pre-swap
-        values.
+        Reverts a swap by restoring the pair state and the ticks it modified
+        to their pre-swap values.
 
         Parameters
         ----------
-        original_state : dict
-            A dictionary containing all the class attributes before the swap.
+        snapshot : tuple
+            The pair state before the swap, as taken by `swap`.
+        patched_ticks : List[Tuple[Tick, float, float]]
+            The ticks modified by the swap, with their pre-swap fee growth
+            outside in token x and token y, in the order they were modified.
+        """
+        (self.liquidity, self.curr_sqrt_price, self.curr_tick_idx,
+         self.fee_growth_global_x, self.fee_growth_global_y,
+         self.token_x_balance, self.token_y_balance) = snapshot
+        self._restore_ticks(patched_ticks)
+        self._fee_within_range_cache.clear()
+
+    def _restore_ticks(
+            self,
+            patched_ticks: List[Tuple[Tick, float, float]]
+    ) -> None:
+        """
+        Restores the fee growth outside of the ticks modified by a swap,
+        undoing the modifications in reverse order.
         """
-        self.__dict__.update(original_state)
+        for tick, fee_growth_outside_x, fee_growth_outside_y in reversed(
+                patched_ticks):
+            tick.fee_growth_outside_x = fee_growth_outside_x
+            tick.fee_growth_outside_y = fee_growth_outside_y
 
     def swap(
             self,
@@ -630,33 +707,82 @@ class Pair:
             The amount of the token swapped out.
         """
 
-        original_state = self.__dict__.copy()
+        # A swap only mutates these attributes and the fee growth outside of
+        # the ticks it crosses, which are logged in `patched_ticks`
+        snapshot = (self.liquidity, self.curr_sqrt_price, self.curr_tick_idx,
+                    self.fee_growth_global_x, self.fee_growth_global_y,
+                    self.token_x_balance, self.token_y_balance)
+        patched_ticks = []
         try:
+            # Failures come back as a kernel status rather than as raised
+            # exceptions; only unexpected errors reach the except clause
             if token_in_addr == self.token_x:
-                amount_out = self.swap_x_for_y(amount_in, sqrt_price_limit)
-                if not simulate:
+                status, amount_out = self._swap_x_for_y(
+                    amount_in, sqrt_price_limit, patched_ticks
+                )
+                if status == swap_math.SWAP_OK and not simulate:
                     self.token_x_balance += amount_in
                     self.token_y_balance -= amount_out
             else:
-                amount_out = self.swap_y_for_x(amount_in, sqrt_price_limit)
-                if not simulate:
+                status, amount_out = self._swap_y_for_x(
+                    amount_in, sqrt_price_limit, patched_ticks
+                )
+                if status == swap_math.SWAP_OK and not simulate:
                     self.token_y_balance += amount_in
                     self.token_x_balance -= amount_out
-            if simulate:
-                self.revert_swap(original_state)
-            return amount_out
         except Exception:
+            status = None
+        if status != swap_math.SWAP_OK:
             print('''
                   SWAP FAILED
                   Restoring all pool attributes to their pre-swap values
                   ''')
-            # Restore all class attributes to their pre-swap values
-            self.revert_swap(original_state)
+            # Restore all pool attributes to their pre-swap values
+            self.revert_swap(snapshot, patched_ticks)
+            return None
+        if simulate:
+            self.revert_swap(snapshot, patched_ticks)
+        return amount_out
+
+    def swap_by_price(
+            self,
+            token_in_addr: str,
+            amount_in: float,
+            price_limit: float,
+            simulate: bool = False
+    ) -> float:
+        """
+        Performs a swap in the Uniswap pool with a limit given as a price.
+
+        The square root of the limit is taken once here; the swap itself
+        only works in square root prices.
+
+        Parameters
+        ----------
+        token_in_addr : str
+            The token to be swapped in.
+        amount_in : float
+            The amount of the token to be swapped in.
+        price_limit : float
+            The limit of the price for the swap (to protect against
+            slippage).
+        simulate : bool
+            Whether to revert the pair to its pre-swap state afterwards.
+
+        Returns
+        -------
+        float
+            The amount of the token swapped out.
+        """
+        return self.swap(
+            token_in_addr, amount_in, sqrt(price_limit), simulate
+        )
 
     def swap_x_for_y(
         self,
         amount_in: float,
-        sqrt_price_limit: float
+        sqrt_price_limit: float,
+        patched_ticks: List[Tuple[Tick, float, float]] = None
     ) -> float:
         """
         Swaps token X for token Y in the Uniswap pool.
@@ -667,6 +793,9 @@ class Pair:
             The amount of token X to be swapped in (after deducting fees).
         sqrt_price_limit : float
             The limit of the square root price for the swap.
+        patched_ticks : List[Tuple[Tick, float, float]]
+            If given, each crossed tick is appended along with its fee growth
+            outside before the crossing, so the swap can be reverted.
 
         Returns
         -------
@@ -674,78 +803,57 @@ class Pair:
             The amount of token Y swapped out.
         """
 
-        amount_out = 0
-        amount_remaining = amount_in
-        next_tick = self.find_next_tick(self.curr_tick_idx, False)
-        if next_tick is None:
-            raise InsufficientLiquidityException
-        lower_tick_sqrt_price, _ = self.tick_to_sqrt_price(next_tick)
-
-        while amount_remaining > 0:
-            amount_remaining_after_fees, fees_deducted =\
-                self.deduct_fees(amount_remaining)
-            # delta(1/sqrt(P)) = delta(x) / L
-            delta_inv_sqrt_price = amount_remaining_after_fees/self.liquidity
-            inv_sqrt_price = 1/self.curr_sqrt_price
-            updated_inv_sqrt_price = inv_sqrt_price + delta_inv_sqrt_price
-            # New sqrt price
-            updated_sqrt_price = 1/updated_inv_sqrt_price
-            # If new sqrt price is within current tick
-            if updated_sqrt_price >= lower_tick_sqrt_price:
-                # delta(sqrt(P))
-                delta_sqrt_price = self.curr_sqrt_price - updated_sqrt_price
-                # delta(y) = delta(sqrt(P)) * L
-                amount_out += int(delta_sqrt_price * self.liquidity)
-                amount_remaining = 0
-                # Update fees
-                self.fee_growth_global_x += fees_deducted/self.liquidity
-                # Update state
-                self.curr_sqrt_price = updated_sqrt_price
-                self.curr_tick_idx =\
-                    self.sqrt_price_to_tick(self.curr_sqrt_price)
-            else:
-                # delta(x) = delta(1/sqrt(P)) * L
-                amount_used_for_swap =\
-                    (((1/lower_tick_sqrt_price) - (1/self.curr_sqrt_price))
-                        * self.liquidity)
-                amount_used, fees_deducted =\
-                    self.add_fees(amount_used_for_swap)
-                # delta(sqrt(P))
-                delta_sqrt_price =\
-                    self.curr_sqrt_price - lower_tick_sqrt_price
-                # delta(y) = delta(sqrt(P)) * L
-                amount_out += int(delta_sqrt_price * self.liquidity)
-                amount_remaining = amount_remaining - amount_used
-                self.fee_growth_global_x += fees_deducted/self.liquidity
-                # Update state
-                self.curr_tick_idx = next_tick
-                print('Tick crossed: ', self.curr_tick_idx)
-                print('Liquidity pct change: ', self.ticks[self.curr_tick_idx].liquidity_net*100/self.liquidity)
-                next_tick = self.find_next_tick(self.curr_tick_idx, False)
-                if next_tick is None:
-                    raise InsufficientLiquidityException
-                self.curr_sqrt_price = lower_tick_sqrt_price
-                self.liquidity = (
-                    self.liquidity
-                    - self.ticks[self.curr_tick_idx].liquidity_net
-                )
-                if self.liquidity == 0:
-                    raise InsufficientLiquidityException
-                lower_tick_sqrt_price, _ = self.tick_to_sqrt_price(next_tick)
-                # Update fee growth outside
-                (self.ticks[self.curr_tick_idx].fee_growth_outside_x,
-                 self.ticks[self.curr_tick_idx].fee_growth_outside_y) =\
-                    self.fee_growth_outside(self.curr_tick_idx)
-
-            if self.curr_sqrt_price <= sqrt_price_limit:
+        if patched_ticks is None:
+            patched_ticks = []
+        first_patch = len(patched_ticks)
+        status, amount_out = self._swap_x_for_y(
+            amount_in, sqrt_price_limit, patched_ticks
+        )
+        if status != swap_math.SWAP_OK:
+            # A failed swap leaves the pair state untouched, so the ticks it
+            # crossed are restored too before raising
+            self._restore_ticks(patched_ticks[first_patch:])
+            del patched_ticks[first_patch:]
+            if status == swap_math.SWAP_SLIPPAGE_TOO_HIGH:
                 raise SlippageTooHighException
-
+            raise InsufficientLiquidityException
         return amount_out
 
+    def _swap_x_for_y(
+        self,
+        amount_in: float,
+        sqrt_price_limit: float,
+        patched_ticks: List[Tuple[Tick, float, float]]
+    ) -> Tuple[int, float]:
+        """
+        Runs the token X for token Y swap kernel and, if it succeeds,
+        writes the resulting state back to the pair. Returns the kernel
+        status and the amount of token Y swapped out.
+        """
+        self._fee_within_range_cache.clear()
+        (status, amount_out, sqrt_price, tick_idx, liquidity,
+         fee_growth_global_x) = swap_math.swap_x_for_y(
+            amount_in, sqrt_price_limit, self.curr_sqrt_price,
+            self.curr_tick_idx, self.liquidity, self.fee_growth_global_x,
+            self.fee_growth_global_y, self._tick_keys, self._sorted_ticks,
+            self._tick_sqrt_prices, self.fee_tier, patched_ticks
+        )
+        if status != swap_math.SWAP_OK:
+            return status, amount_out
+
+        self.curr_sqrt_price = sqrt_price
+        if tick_idx is None:
+            tick_idx = self.sqrt_price_to_tick(sqrt_price)
+        self.curr_tick_idx = tick_idx
+        self.liquidity = liquidity
+        self.fee_growth_global_x = fee_growth_global_x
+        return status, amount_out
+
     def swap_y_for_x(
         self,
         amount_in: float,
-        sqrt_price_limit: float
+        sqrt_price_limit: float,
+        patched_ticks: List[Tuple[Tick, float, float]] = None
     ) -> float:
         """
         Swaps token Y for token X in the Uniswap pool.
@@ -756,6 +864,9 @@ class Pair:
             The amount of token Y to be swapped in (after deducting fees).
         sqrt_price_limit : float
             The limit of the square root price for the swap.
+        patched_ticks : List[Tuple[Tick, float, float]]
+            If given, each crossed tick is appended along with its fee growth
+            outside before the crossing, so the swap can be reverted.
 
         Returns
         -------
@@ -763,70 +874,52 @@ class Pair:
             The amount of token X swapped out.
         """
 
-        amount_out = 0
-        amount_remaining = amount_in
-        next_tick = self.find_next_tick(self.curr_tick_idx, True)
-        if next_tick is None:
-            raise InsufficientLiquidityException
-        lower_tick_sqrt_price, _ = self.tick_to_sqrt_price(next_tick)
-
-        while amount_remaining > 0:
-            amount_remaining_after_fees, fees_deducted =\
-                self.deduct_fees(amount_remaining)
-            # delta(sqrt(P)) = delta(y) / L
-            delta_sqrt_price = amount_remaining_after_fees / self.liquidity
-            updated_sqrt_price = self.curr_sqrt_price + delta_sqrt_price
-            # If new sqrt price is within current tick
-            if updated_sqrt_price <= lower_tick_sqrt_price:
-                # delta(x) = delta(1/sqrt(P)) * L
-                delta_inv_sqrt_price =\
-                    (1/self.curr_sqrt_price) - (1/updated_sqrt_price)
-                amount_out += delta_inv_sqrt_price * self.liquidity
-                amount_remaining = 0
-                # Update fees
-                self.fee_growth_global_y += fees_deducted/self.liquidity
-                # Update state
-                self.curr_sqrt_price = updated_sqrt_price
-                self.curr_tick_idx =\
-                    self.sqrt_price_to_tick(self.curr_sqrt_price)
-            else:
-                # delta(y) = delta(sqrt(P)) * L
-                amount_used_for_swap =\
-                    ((lower_tick_sqrt_price - self.curr_sqrt_price)
-                     * self.liquidity)
-                amount_used, fees_deducted =\
-                    self.add_fees(amount_used_for_swap)
-                # delta(1/sqrt(P))
-                delta_inv_sqrt_price =\
-                    (1/self.curr_sqrt_price) - (1/lower_tick_sqrt_price)
-                amount_out += delta_inv_sqrt_price * self.liquidity
-                amount_remaining = amount_remaining - amount_used
-                self.fee_growth_global_y += fees_deducted/self.liquidity
-                # Update state
-                self.curr_tick_idx = next_tick
-                print('Tick crossed: ', self.curr_tick_idx)
-                print('Liquidity pct change: ', self.ticks[self.curr_tick_idx].liquidity_net*100/self.liquidity)
-                next_tick = self.find_next_tick(self.curr_tick_idx, True)
-                if next_tick is None:
-                    raise InsufficientLiquidityException
-                self.curr_sqrt_price = lower_tick_sqrt_price
-                self.liquidity = (
-                    self.liquidity
-                    + self.ticks[self.curr_tick_idx].liquidity_net
-                )
-                if self.liquidity == 0:
-                    raise InsufficientLiquidityException
-                lower_tick_sqrt_price, _ = self.tick_to_sqrt_price(next_tick)
-                # Update fee growth outside
-                (self.ticks[self.curr_tick_idx].fee_growth_outside_x,
-                 self.ticks[self.curr_tick_idx].fee_growth_outside_y) =\
-                    self.fee_growth_outside(self.curr_tick_idx)
-
-            if self.curr_sqrt_price >= sqrt_price_limit:
+        if patched_ticks is None:
+            patched_ticks = []
+        first_patch = len(patched_ticks)
+        status, amount_out = self._swap_y_for_x(
+            amount_in, sqrt_price_limit, patched_ticks
+        )
+        if status != swap_math.SWAP_OK:
+            # A failed swap leaves the pair state untouched, so the ticks it
+            # crossed are restored too before raising
+            self._restore_ticks(patched_ticks[first_patch:])
+            del patched_ticks[first_patch:]
+            if status == swap_math.SWAP_SLIPPAGE_TOO_HIGH:
                 raise SlippageTooHighException
-
+            raise InsufficientLiquidityException
         return amount_out
 
+    def _swap_y_for_x(
+        self,
+        amount_in: float,
+        sqrt_price_limit: float,
+        patched_ticks: List[Tuple[Tick, float, float]]
+    ) -> Tuple[int, float]:
+        """
+        Runs the token Y for token X swap kernel and, if it succeeds,
+        writes the resulting state back to the pair. Returns the kernel
+        status and the amount of token X swapped out.
+        """
+        self._fee_within_range_cache.clear()
+        (status, amount_out, sqrt_price, tick_idx, liquidity,
+         fee_growth_global_y) = swap_math.swap_y_for_x(
+            amount_in, sqrt_price_limit, self.curr_sqrt_price,
+            self.curr_tick_idx, self.liquidity, self.fee_growth_global_x,
+            self.fee_growth_global_y, self._tick_keys, self._sorted_ticks,
+            self._tick_sqrt_prices, self.fee_tier, patched_ticks
+        )
+        if status != swap_math.SWAP_OK:
+            return status, amount_out
+
+        self.curr_sqrt_price = sqrt_price
+        if tick_idx is None:
+            tick_idx = self.sqrt_price_to_tick(sqrt_price)
+        self.curr_tick_idx = tick_idx
+        self.liquidity = liquidity
+        self.fee_growth_global_y = fee_growth_global_y
+        return status, amount_out
+
 
 class SlippageTooHighException(Exception):
     """Raised when slippage due to swap is too high"""
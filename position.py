@@ -19,6 +19,17 @@ class Position:
         Number of ticks between, and including, the lower and upper ticks
 
     """
+    __slots__ = (
+        'owner',
+        'liquidity',
+        'lower_tick',
+        'upper_tick',
+        'fee_growth_inside_x',
+        'fee_growth_inside_y',
+        'fees_x',
+        'fees_y'
+    )
+
     def __init__(
             self,
             owner: str,
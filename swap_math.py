@@ -0,0 +1,304 @@
+from bisect import bisect_left, bisect_right
+import logging
+from tick import Tick
+from typing import List, Optional, Tuple
+
+_log = logging.getLogger(__name__)
+
+# Outcomes of a swap kernel
+SWAP_OK = 0
+SWAP_SLIPPAGE_TOO_HIGH = 1
+SWAP_INSUFFICIENT_LIQUIDITY = 2
+
+
+def swap_x_for_y(
+        amount_in: float,
+        sqrt_price_limit: float,
+        sqrt_price: float,
+        tick_idx: int,
+        liquidity: int,
+        fee_growth_global_x: float,
+        fee_growth_global_y: float,
+        tick_keys: List[int],
+        sorted_ticks: List[Tick],
+        tick_sqrt_prices: List[float],
+        fee_tier: float,
+        patched_ticks: List[Tuple[Tick, float, float]]
+) -> Tuple[int, float, float, Optional[int], int, float]:
+    """
+    Runs a token X for token Y swap on local copies of the pool state.
+
+    Only the fee growth outside of crossed ticks is written in place; each
+    such tick is first appended to `patched_ticks` with its old values.
+
+    Parameters
+    ----------
+    amount_in : float
+        The amount of token X to be swapped in.
+    sqrt_price_limit : float
+        The limit of the square root price for the swap.
+    sqrt_price : float
+        The current square root price of the pair.
+    tick_idx : int
+        The current tick index of the pair.
+    liquidity : int
+        The active liquidity of the pair.
+    fee_growth_global_x : float
+        The global fee growth of token X.
+    fee_growth_global_y : float
+        The global fee growth of token Y.
+    tick_keys : List[int]
+        The sorted indexes of the initialized ticks.
+    sorted_ticks : List[Tick]
+        The initialized ticks, in the same order as `tick_keys`.
+    tick_sqrt_prices : List[float]
+        The sqrt prices of the initialized ticks, in the same order as
+        `tick_keys`.
+    fee_tier : float
+        The fee tier of the pair.
+    patched_ticks : List[Tuple[Tick, float, float]]
+        Crossed ticks and their fee growth outside before the crossing.
+
+    Returns
+    -------
+    int
+        SWAP_OK, or the reason the swap failed.
+    float
+        The amount of token Y swapped out.
+    float
+        The square root price after the swap.
+    Optional[int]
+        The tick crossed by the last step, or None if the swap ended inside a
+        tick and the tick index must be derived from the sqrt price.
+    int
+        The active liquidity after the swap.
+    float
+        The global fee growth of token X after the swap.
+    """
+    amount_out = 0
+    amount_remaining = amount_in
+    tick_idx_out = None
+    # Swaps never add or remove ticks, so the ticks to cross are walked
+    # down the sorted index from a single search
+    next_tick_pos = bisect_left(tick_keys, tick_idx) - 1
+    if next_tick_pos < 0:
+        return (SWAP_INSUFFICIENT_LIQUIDITY, amount_out, sqrt_price,
+                tick_idx_out, liquidity, fee_growth_global_x)
+    lower_tick_sqrt_price = tick_sqrt_prices[next_tick_pos]
+    # Reciprocals are carried across steps and only recomputed when the
+    # underlying sqrt price changes
+    inv_sqrt_price = 1/sqrt_price
+    inv_lower_tick_sqrt_price = 1/lower_tick_sqrt_price
+    inv_one_minus_fee_tier = 1/(1 - fee_tier)
+
+    while amount_remaining > 0:
+        fees_deducted = int(amount_remaining * fee_tier)
+        amount_remaining_after_fees = amount_remaining - fees_deducted
+        # delta(1/sqrt(P)) = delta(x) / L
+        delta_inv_sqrt_price = amount_remaining_after_fees/liquidity
+        updated_inv_sqrt_price = inv_sqrt_price + delta_inv_sqrt_price
+        # New sqrt price
+        updated_sqrt_price = 1/updated_inv_sqrt_price
+        # If new sqrt price is within current tick
+        if updated_sqrt_price >= lower_tick_sqrt_price:
+            # delta(y) = delta(sqrt(P)) * L
+            amount_out += int((sqrt_price - updated_sqrt_price) * liquidity)
+            amount_remaining = 0
+            fee_growth_global_x += fees_deducted/liquidity
+            sqrt_price = updated_sqrt_price
+            tick_idx_out = None
+        else:
+            # delta(x) = delta(1/sqrt(P)) * L
+            amount_used_for_swap =\
+                (inv_lower_tick_sqrt_price - inv_sqrt_price) * liquidity
+            amount_used = amount_used_for_swap * inv_one_minus_fee_tier
+            fees_deducted = amount_used - amount_used_for_swap
+            # delta(y) = delta(sqrt(P)) * L
+            amount_out +=\
+                int((sqrt_price - lower_tick_sqrt_price) * liquidity)
+            amount_remaining = amount_remaining - amount_used
+            fee_growth_global_x += fees_deducted/liquidity
+            sqrt_price = lower_tick_sqrt_price
+            # Stop at the first tick past the limit rather than crossing the
+            # rest of the range only to revert it
+            if sqrt_price <= sqrt_price_limit:
+                return (SWAP_SLIPPAGE_TOO_HIGH, amount_out, sqrt_price,
+                        tick_idx_out, liquidity, fee_growth_global_x)
+            # Cross the tick
+            tick = sorted_ticks[next_tick_pos]
+            tick_idx_out = tick.idx
+            if _log.isEnabledFor(logging.DEBUG):
+                _log.debug('Tick crossed: %d; liquidity pct change: %.4f',
+                           tick.idx, tick.liquidity_net * 100 / liquidity)
+            next_tick_pos -= 1
+            if next_tick_pos < 0:
+                return (SWAP_INSUFFICIENT_LIQUIDITY, amount_out, sqrt_price,
+                        tick_idx_out, liquidity, fee_growth_global_x)
+            liquidity -= tick.liquidity_net
+            if liquidity == 0:
+                return (SWAP_INSUFFICIENT_LIQUIDITY, amount_out, sqrt_price,
+                        tick_idx_out, liquidity, fee_growth_global_x)
+            inv_sqrt_price = inv_lower_tick_sqrt_price
+            lower_tick_sqrt_price = tick_sqrt_prices[next_tick_pos]
+            inv_lower_tick_sqrt_price = 1/lower_tick_sqrt_price
+            # Update fee growth outside
+            patched_ticks.append((tick, tick.fee_growth_outside_x,
+                                  tick.fee_growth_outside_y))
+            tick.fee_growth_outside_x =\
+                fee_growth_global_x - tick.fee_growth_outside_x
+            tick.fee_growth_outside_y =\
+                fee_growth_global_y - tick.fee_growth_outside_y
+
+    # Crossing steps check the limit as they reach each tick; only the final
+    # step, which ends inside a tick, is left to check here
+    if sqrt_price <= sqrt_price_limit:
+        return (SWAP_SLIPPAGE_TOO_HIGH, amount_out, sqrt_price,
+                tick_idx_out, liquidity, fee_growth_global_x)
+    return (SWAP_OK, amount_out, sqrt_price, tick_idx_out, liquidity,
+            fee_growth_global_x)
+
+
+def swap_y_for_x(
+        amount_in: float,
+        sqrt_price_limit: float,
+        sqrt_price: float,
+        tick_idx: int,
+        liquidity: int,
+        fee_growth_global_x: float,
+        fee_growth_global_y: float,
+        tick_keys: List[int],
+        sorted_ticks: List[Tick],
+        tick_sqrt_prices: List[float],
+        fee_tier: float,
+        patched_ticks: List[Tuple[Tick, float, float]]
+) -> Tuple[int, float, float, Optional[int], int, float]:
+    """
+    Runs a token Y for token X swap on local copies of the pool state.
+
+    Only the fee growth outside of crossed ticks is written in place; each
+    such tick is first appended to `patched_ticks` with its old values.
+
+    Parameters
+    ----------
+    amount_in : float
+        The amount of token Y to be swapped in.
+    sqrt_price_limit : float
+        The limit of the square root price for the swap.
+    sqrt_price : float
+        The current square root price of the pair.
+    tick_idx : int
+        The current tick index of the pair.
+    liquidity : int
+        The active liquidity of the pair.
+    fee_growth_global_x : float
+        The global fee growth of token X.
+    fee_growth_global_y : float
+        The global fee growth of token Y.
+    tick_keys : List[int]
+        The sorted indexes of the initialized ticks.
+    sorted_ticks : List[Tick]
+        The initialized ticks, in the same order as `tick_keys`.
+    tick_sqrt_prices : List[float]
+        The sqrt prices of the initialized ticks, in the same order as
+        `tick_keys`.
+    fee_tier : float
+        The fee tier of the pair.
+    patched_ticks : List[Tuple[Tick, float, float]]
+        Crossed ticks and their fee growth outside before the crossing.
+
+    Returns
+    -------
+    int
+        SWAP_OK, or the reason the swap failed.
+    float
+        The amount of token X swapped out.
+    float
+        The square root price after the swap.
+    Optional[int]
+        The tick crossed by the last step, or None if the swap ended inside a
+        tick and the tick index must be derived from the sqrt price.
+    int
+        The active liquidity after the swap.
+    float
+        The global fee growth of token Y after the swap.
+    """
+    amount_out = 0
+    amount_remaining = amount_in
+    tick_idx_out = None
+    # Swaps never add or remove ticks, so the ticks to cross are walked
+    # up the sorted index from a single search
+    next_tick_pos = bisect_right(tick_keys, tick_idx)
+    if next_tick_pos == len(tick_keys):
+        return (SWAP_INSUFFICIENT_LIQUIDITY, amount_out, sqrt_price,
+                tick_idx_out, liquidity, fee_growth_global_y)
+    upper_tick_sqrt_price = tick_sqrt_prices[next_tick_pos]
+    # Reciprocals are carried across steps and only recomputed when the
+    # underlying sqrt price changes
+    inv_sqrt_price = 1/sqrt_price
+    inv_upper_tick_sqrt_price = 1/upper_tick_sqrt_price
+    inv_one_minus_fee_tier = 1/(1 - fee_tier)
+
+    while amount_remaining > 0:
+        fees_deducted = int(amount_remaining * fee_tier)
+        amount_remaining_after_fees = amount_remaining - fees_deducted
+        # delta(sqrt(P)) = delta(y) / L
+        delta_sqrt_price = amount_remaining_after_fees / liquidity
+        updated_sqrt_price = sqrt_price + delta_sqrt_price
+        # If new sqrt price is within current tick
+        if updated_sqrt_price <= upper_tick_sqrt_price:
+            # delta(x) = delta(1/sqrt(P)) * L
+            delta_inv_sqrt_price = inv_sqrt_price - (1/updated_sqrt_price)
+            amount_out += delta_inv_sqrt_price * liquidity
+            amount_remaining = 0
+            fee_growth_global_y += fees_deducted/liquidity
+            sqrt_price = updated_sqrt_price
+            tick_idx_out = None
+        else:
+            # delta(y) = delta(sqrt(P)) * L
+            amount_used_for_swap =\
+                (upper_tick_sqrt_price - sqrt_price) * liquidity
+            amount_used = amount_used_for_swap * inv_one_minus_fee_tier
+            fees_deducted = amount_used - amount_used_for_swap
+            # delta(1/sqrt(P))
+            delta_inv_sqrt_price = inv_sqrt_price - inv_upper_tick_sqrt_price
+            amount_out += delta_inv_sqrt_price * liquidity
+            amount_remaining = amount_remaining - amount_used
+            fee_growth_global_y += fees_deducted/liquidity
+            sqrt_price = upper_tick_sqrt_price
+            # Stop at the first tick past the limit rather than crossing the
+            # rest of the range only to revert it
+            if sqrt_price >= sqrt_price_limit:
+                return (SWAP_SLIPPAGE_TOO_HIGH, amount_out, sqrt_price,
+                        tick_idx_out, liquidity, fee_growth_global_y)
+            # Cross the tick
+            tick = sorted_ticks[next_tick_pos]
+            tick_idx_out = tick.idx
+            if _log.isEnabledFor(logging.DEBUG):
+                _log.debug('Tick crossed: %d; liquidity pct change: %.4f',
+                           tick.idx, tick.liquidity_net * 100 / liquidity)
+            next_tick_pos += 1
+            if next_tick_pos == len(tick_keys):
+                return (SWAP_INSUFFICIENT_LIQUIDITY, amount_out, sqrt_price,
+                        tick_idx_out, liquidity, fee_growth_global_y)
+            liquidity += tick.liquidity_net
+            if liquidity == 0:
+                return (SWAP_INSUFFICIENT_LIQUIDITY, amount_out, sqrt_price,
+                        tick_idx_out, liquidity, fee_growth_global_y)
+            inv_sqrt_price = inv_upper_tick_sqrt_price
+            upper_tick_sqrt_price = tick_sqrt_prices[next_tick_pos]
+            inv_upper_tick_sqrt_price = 1/upper_tick_sqrt_price
+            # Update fee growth outside
+            patched_ticks.append((tick, tick.fee_growth_outside_x,
+                                  tick.fee_growth_outside_y))
+            tick.fee_growth_outside_x =\
+                fee_growth_global_x - tick.fee_growth_outside_x
+            tick.fee_growth_outside_y =\
+                fee_growth_global_y - tick.fee_growth_outside_y
+
+    # Crossing steps check the limit as they reach each tick; only the final
+    # step, which ends inside a tick, is left to check here
+    if sqrt_price >= sqrt_price_limit:
+        return (SWAP_SLIPPAGE_TOO_HIGH, amount_out, sqrt_price,
+                tick_idx_out, liquidity, fee_growth_global_y)
+    return (SWAP_OK, amount_out, sqrt_price, tick_idx_out, liquidity,
+            fee_growth_global_y)
@@ -11,6 +11,14 @@ class Tick:
         The liquidity at this Tick
 
     """
+    __slots__ = (
+        'idx',
+        'liquidity_net',
+        'liquidity_gross',
+        'fee_growth_outside_x',
+        'fee_growth_outside_y'
+    )
+
     def __init__(
             self,
             idx: int,